@@ -4,6 +4,7 @@ import os
 import sys
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from logging.handlers import RotatingFileHandler
 import socket
 
@@ -89,6 +90,9 @@ MQTT_TOPIC = os.getenv('MQTT_TOPIC')
 MQTT_USER = os.getenv('MQTT_USER')
 MQTT_PASSWORD = os.getenv('MQTT_PASSWORD')
 MATTERMOST_WEBHOOK_URL = os.getenv('MATTERMOST_WEBHOOK_URL')
+MAX_CONCURRENT_UPLOADS = int(os.getenv('MAX_CONCURRENT_UPLOADS', '3'))
+# Events whose clip Frigate still can't create after this many tries are not retried anymore
+CLIP_UNAVAILABLE_MAX_TRIES = 10
 
 # Mattermost-Handler hinzufügen, falls konfiguriert
 if MATTERMOST_WEBHOOK_URL:
@@ -119,12 +123,45 @@ def on_message(client, userdata, msg):
 
     if event_type == 'end' and end_time is not None and has_clip is True:
         event_data = event['after']
-        handle_single_event(event_data)
+        submit_event(event_data)
     else:
         logging.debug(f"Received a MQTT message but event type, end_time or has_clip doesn't interest us. Wait for "
                       f"the full message. Skipping...")
 
 
+# Uploads are network bound, so a few of them run in parallel. Events currently being handled are tracked to
+# avoid uploading the same clip twice when a MQTT message and the scheduled sync overlap.
+upload_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_UPLOADS, thread_name_prefix='upload')
+events_in_progress = set()
+events_in_progress_lock = threading.Lock()
+
+
+def submit_event(event_data):
+    """
+    Schedules a single event for handling on the upload thread pool.
+    :param event_data:
+    :return: the future of the scheduled handling or None if the event is already being handled
+    """
+    event_id = event_data['id']
+    with events_in_progress_lock:
+        if event_id in events_in_progress:
+            logging.debug(f"Event {event_id} is already being handled. Skipping...")
+            return None
+        events_in_progress.add(event_id)
+
+    future = upload_executor.submit(handle_single_event, event_data)
+    future.add_done_callback(lambda f: on_event_done(event_id, f))
+    return future
+
+
+def on_event_done(event_id, future):
+    with events_in_progress_lock:
+        events_in_progress.discard(event_id)
+    error = future.exception()
+    if error is not None:
+        logging.error(f"Error handling event {event_id}: {error}")
+
+
 def handle_single_event(event_data):
     """
     Handles a single event. Uploads the video to Google Drive if available and updates the database.
@@ -150,14 +187,23 @@ def handle_single_event(event_data):
                 logging.debug("Waiting 5 seconds for Frigate to finalize the clip...")
                 time.sleep(5)
                 logging.debug(f"Uploading video {event_id} to Google Drive...")
-                success = google_drive.upload_to_google_drive(event_data, FRIGATE_URL)
+                clip_unavailable = False
+                try:
+                    success = google_drive.upload_to_google_drive(event_data, FRIGATE_URL)
+                except google_drive.ClipUnavailableError as e:
+                    logging.warning(f"Frigate could not create the clip of event {event_id}: {e}")
+                    success, clip_unavailable = False, True
                 if success:
                     logging.info(f"Video {event_id} successfully uploaded.")
                     database.update_event(event_id, 1)
                 else:
-                    database.update_event(event_id, 0)
+                    # Only clips Frigate can't create are given up, every other failure stays retriable
+                    limit = CLIP_UNAVAILABLE_MAX_TRIES if clip_unavailable else None
+                    tries, gave_up = database.increment_and_maybe_giveup(event_id, limit=limit)
+                    if gave_up:
+                        logging.error(f"Failed to upload video {event_id} after {tries} tries. Giving up.")
                     # to prevent annoying logs / notifications... Notify only after 3 tries
-                    if database.select_tries(event_id) >= 3:
+                    elif tries >= 3:
                         logging.error(f"Failed to upload video {event_id}.")
             else:
                 logging.debug(f"Event {event_id} already uploaded. Skipping...")
@@ -177,11 +223,15 @@ def handle_all_events():
     else:
         # Process the fetched events
         logging.debug(f"Received {len(all_events)} events")
+        futures = []
         i = 1
         for event in all_events:
-            logging.debug(f"Handling event #{i}: {event['id']} in handle_all_events")
-            handle_single_event(event)
+            logging.debug(f"Submitting event #{i}: {event['id']} in handle_all_events")
+            future = submit_event(event)
+            if future is not None:
+                futures.append(future)
             i = i + 1
+        wait(futures)
 
 
 # MQTT Reconnect settings
@@ -279,6 +329,7 @@ def main():
             time.sleep(1)
     except (KeyboardInterrupt, SystemExit):
         scheduler.shutdown()
+        upload_executor.shutdown(wait=False)
 
 
 if __name__ == "__main__":
@@ -35,6 +35,14 @@ def init_db(db_path=DB_PATH):
             )
         ''')
 
+        # Create the drive_folders table if it does not exist. Caches Google Drive folder IDs by their path.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS drive_folders (
+                path TEXT PRIMARY KEY,
+                folder_id TEXT NOT NULL
+            )
+        ''')
+
         # Trigger für last_updated hinzufügen
         cursor.execute('''
             CREATE TRIGGER IF NOT EXISTS update_last_updated
@@ -136,6 +144,37 @@ def update_event(event_id, uploaded, retry=None, db_path=DB_PATH):
     conn.close()
 
 
+def increment_and_maybe_giveup(event_id, limit=None, db_path=DB_PATH):
+    """
+    Records a failed upload try of an event in a single statement and marks the event as non-retriable
+    once it reached the limit of tries.
+    :param event_id:
+    :param limit: number of tries after which the event is given up, None to never give up
+    :param db_path:
+    :return: tuple of the number of tries and whether the event was given up
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE events
+            SET uploaded = 0,
+                retry = CASE WHEN tries + 1 >= ? THEN 0 ELSE retry END,
+                tries = tries + 1
+            WHERE event_id = ?
+        ''', (limit, event_id))
+        cursor.execute('SELECT tries, retry FROM events WHERE event_id = ?', (event_id,))
+        result = cursor.fetchone()
+        conn.commit()
+        return (result[0], result[1] == 0) if result else (0, False)
+    except Exception as e:
+        logging.error(f"Error recording failed try of event: {e}")
+        conn.rollback()
+        return 0, False
+    finally:
+        conn.close()
+
+
 def select_retry(event_id, db_path=DB_PATH):
     """
     Selects the retry status of an event.
@@ -290,3 +329,60 @@ def cleanup_old_events(db_path=DB_PATH):
         logging.error(f"Error cleaning up old events: {e}")
     finally:
         conn.close()
+
+
+def select_drive_folders(paths, db_path=DB_PATH):
+    """
+    Selects the cached Google Drive folder IDs of the given folder paths.
+    :param paths:
+    :param db_path:
+    :return: dict of path -> folder_id for all paths that are cached
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        placeholders = ', '.join('?' for _ in paths)
+        cursor.execute(f'SELECT path, folder_id FROM drive_folders WHERE path IN ({placeholders})', list(paths))
+        return dict(cursor.fetchall())
+    except Exception as e:
+        logging.error(f"Error selecting drive folders: {e}")
+        return {}
+    finally:
+        conn.close()
+
+
+def upsert_drive_folder(path, folder_id, db_path=DB_PATH):
+    """
+    Inserts or updates the cached Google Drive folder ID of a folder path.
+    :param path:
+    :param folder_id:
+    :param db_path:
+    :return:
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('INSERT OR REPLACE INTO drive_folders (path, folder_id) VALUES (?, ?)', (path, folder_id))
+        conn.commit()
+    except Exception as e:
+        logging.error(f"Error upserting drive folder: {e}")
+    finally:
+        conn.close()
+
+
+def delete_drive_folder(folder_id, db_path=DB_PATH):
+    """
+    Deletes a Google Drive folder ID from the cache, e.g. because the folder was deleted.
+    :param folder_id:
+    :param db_path:
+    :return:
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM drive_folders WHERE folder_id = ?', (folder_id,))
+        conn.commit()
+    except Exception as e:
+        logging.error(f"Error deleting drive folder: {e}")
+    finally:
+        conn.close()
@@ -1,20 +1,31 @@
+import io
+import json
 import logging
 import os
+import queue
 import ssl
+import shutil
 import socket
 import tempfile
 import threading
 import time
 import random
 import requests
+import httplib2
+import google_auth_httplib2
 from dotenv import load_dotenv
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaIoBaseUpload, MediaIoBaseDownload
+from googleapiclient.http import MediaIoBaseUpload, MediaIoBaseDownload, MediaUpload
 from datetime import datetime, timedelta
-import pytz
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    from backports.zoneinfo import ZoneInfo
 from google.oauth2 import service_account
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
 from urllib3.util.retry import Retry
 
 from src import database
@@ -24,8 +35,14 @@ load_dotenv()
 GDRIVE_RETENTION_DAYS = int(os.getenv('GDRIVE_RETENTION_DAYS', 0))
 
 UPLOAD_DIR = os.getenv('UPLOAD_DIR')
+# Pipe the Frigate download straight into the Drive upload instead of buffering the clip in a tempfile first.
+STREAM_UPLOADS = os.getenv('STREAM_UPLOADS', 'true').lower() in ('true', '1', 'yes')
+# Buffered clips up to this size are kept in memory, only larger ones are spilled to disk.
+SPOOL_MAX_SIZE = int(os.getenv('SPOOL_MAX_SIZE', 64 * 1024 * 1024))
 # Prioritize standard 'TZ' env var, but fall back to 'TIMEZONE' for backward compatibility.
 TIMEZONE = os.getenv('TZ', os.getenv('TIMEZONE', 'Europe/Istanbul'))
+# Resolved once instead of per event
+LOCAL_TIMEZONE = ZoneInfo(TIMEZONE)
 SERVICE_ACCOUNT_FILE = os.getenv('SERVICE_ACCOUNT_FILE')
 GOOGLE_ACCOUNT_TO_IMPERSONATE = os.getenv('GOOGLE_ACCOUNT_TO_IMPERSONATE')
 
@@ -35,8 +52,20 @@ INITIAL_RETRY_DELAY = 1  # seconds
 MAX_RETRY_DELAY = 60  # seconds
 UPLOAD_CHUNK_SIZE = 1024 * 1024 * 10  # 10MB chunks for resumable uploads
 DOWNLOAD_TIMEOUT = 300  # 5 minutes for video download
+API_TIMEOUT = 60  # socket timeout for Google Drive API requests
+DOWNLOAD_CONNECT_TIMEOUT = 10  # seconds to establish the connection to Frigate
+DOWNLOAD_POOL_SIZE = 8  # kept-alive connections to Frigate shared by the upload workers
+DOWNLOAD_COPY_SIZE = 1024 * 1024  # 1MB reads when buffering a clip into a tempfile
+DOWNLOAD_QUEUE_SIZE = 16  # downloaded blocks held in memory while the upload catches up
+ERROR_BODY_LIMIT = 4096  # bytes read from the body of a failed clip download
+CLIP_UNAVAILABLE_MESSAGE = "Could not create clip from recordings"
 
 SCOPES = ['https://www.googleapis.com/auth/drive']
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+# The Drive discovery document bundled with google-api-python-client. Read once and shared by the services
+# of all threads, so building a service never fetches it over the network or reads it from disk again.
+DRIVE_DISCOVERY_DOC = get_static_doc('drive', 'v3')
 
 def get_google_service():
     """Initialize and return a Google Drive service."""
@@ -59,8 +88,10 @@ def get_google_service():
                 SERVICE_ACCOUNT_FILE, scopes=SCOPES)
             logging.info("Using service account without impersonation")
         
-        # Build and return the service
-        return build('drive', 'v3', credentials=credentials, cache_discovery=False)
+        # Build the service on an explicit, persistent connection with its own timeout. Otherwise the
+        # default transport picks up whatever socket.setdefaulttimeout() was set to last.
+        http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http(timeout=API_TIMEOUT))
+        return build_from_document(DRIVE_DISCOVERY_DOC, http=http)
         
     except Exception as e:
         error_msg = f"Error initializing Google Drive service: {str(e)}"
@@ -70,73 +101,188 @@ def get_google_service():
 # Initialize the service
 service = get_google_service()
 
+# The httplib2 transport behind a service is not thread-safe, so every upload worker builds its own
+_thread_local = threading.local()
+
+
+def get_thread_service():
+    """Return the Google Drive service of the current thread, creating it on first use."""
+    thread_service = getattr(_thread_local, 'service', None)
+    if thread_service is None:
+        thread_service = get_google_service()
+        _thread_local.service = thread_service
+    return thread_service
+
 # Cache for folder IDs to avoid repeated lookups and improve resilience
 _folder_id_cache = {}
 
+# Upload folder IDs by local date. All events of a day share a folder, so after the first one the path is skipped.
+_day_folder_cache = {}
+
 # Lock to prevent race conditions when creating folders
 folder_creation_lock = threading.Lock()
 
 
-def generate_filename(camera_name, start_time, event_id):
-    utc_time = datetime.fromtimestamp(start_time, pytz.utc)
-    local_time = utc_time.astimezone(pytz.timezone(TIMEZONE))
+def _escape_query_value(value):
+    """Escapes a value for use inside a single-quoted string of a Drive search query."""
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+
+def to_local_time(start_time):
+    """Converts a Frigate timestamp into an aware datetime in the configured timezone."""
+    return datetime.fromtimestamp(start_time, LOCAL_TIMEZONE)
+
+
+def generate_filename(camera_name, local_time, event_id):
     return f"{local_time.strftime('%Y-%m-%d-%H-%M-%S')}__{camera_name}__{event_id}.mp4"
 
 
-def find_or_create_folder(name, parent_id=None):
+def find_or_create_folder_path(names, parent_id=None):
     """
-    Finds a folder by name and parent_id, creating it if it doesn't exist.
-    Uses a cache to avoid repeated API calls and improve resilience against network errors.
+    Resolves a nested folder path like [UPLOAD_DIR, year, month, day] below parent_id to the ID of its last
+    folder, creating missing folders on the way. Cached folders are resolved without any API call, the folders
+    below the longest cached prefix are looked up together with a single query instead of one query each.
     """
-    cache_key = (parent_id, name)
-    if cache_key in _folder_id_cache:
-        logging.debug(f"Found folder '{name}' in cache with ID: {_folder_id_cache[cache_key]}")
-        return _folder_id_cache[cache_key]
+    folder_id = _resolve_cached_folder_path(names, parent_id)
+    if folder_id is not None:
+        return folder_id
 
     # Use a lock to prevent race conditions where multiple threads try to create the same folder.
     with folder_creation_lock:
         # Double-check the cache inside the lock in case another thread populated it while waiting
-        if cache_key in _folder_id_cache:
-            logging.debug(f"Found folder '{name}' in cache (after lock) with ID: {_folder_id_cache[cache_key]}")
-            return _folder_id_cache[cache_key]
+        folder_id = _resolve_cached_folder_path(names, parent_id)
+        if folder_id is not None:
+            return folder_id
+
+        # Paths starting at the top level are persisted, so a restart doesn't have to look them up again
+        persist = parent_id is None
+        if persist:
+            _load_persisted_folder_path(names)
+            folder_id = _resolve_cached_folder_path(names, parent_id)
+            if folder_id is not None:
+                return folder_id
+
+        # Start below the longest cached prefix and only query the names of the missing folders
+        start = 0
+        while start < len(names) and (parent_id, names[start]) in _folder_id_cache:
+            parent_id = _folder_id_cache[(parent_id, names[start])]
+            start += 1
 
         try:
-            query = f"name='{name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
-            if parent_id:
-                query += f" and '{parent_id}' in parents"
-
-            results = service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
-            folders = results.get('files', [])
-
-            if not folders:
-                folder_metadata = {
-                    'name': name,
-                    'mimeType': 'application/vnd.google-apps.folder',
-                    'parents': [parent_id] if parent_id else []
-                }
-                folder = service.files().create(body=folder_metadata, fields='id').execute()
-                folder_id = folder.get('id')
-                logging.debug(f"Created folder '{name}' with ID: {folder_id}")
-                _folder_id_cache[cache_key] = folder_id
-                return folder_id
-            else:
-                folder_id = folders[0]['id']
-                logging.debug(f"Found existing folder '{name}' with ID: {folder_id}")
+            candidates = _list_folders_by_name(set(names[start:]))
+            for i in range(start, len(names)):
+                name = names[i]
+                cache_key = (parent_id, name)
+                folder_id = next((folder['id'] for folder in candidates.get(name, [])
+                                  if not parent_id or parent_id in folder.get('parents', [])), None)
+                if folder_id:
+                    logging.debug(f"Found existing folder '{name}' with ID: {folder_id}")
+                else:
+                    folder_metadata = {
+                        'name': name,
+                        'mimeType': FOLDER_MIME_TYPE,
+                        'parents': [parent_id] if parent_id else []
+                    }
+                    folder = get_thread_service().files().create(body=folder_metadata, fields='id').execute()
+                    folder_id = folder.get('id')
+                    logging.debug(f"Created folder '{name}' with ID: {folder_id}")
+
                 _folder_id_cache[cache_key] = folder_id
-                return folder_id
+                if persist:
+                    database.upsert_drive_folder('/'.join(names[:i + 1]), folder_id)
+                parent_id = folder_id
+            return parent_id
 
         except (HttpError, socket.timeout) as error:
-            logging.error(f"An error occurred while finding or creating folder '{name}': {error}")
+            logging.error(f"An error occurred while finding or creating folder '{'/'.join(names)}': {error}")
             return None
 
 
+def _resolve_cached_folder_path(names, parent_id):
+    """Returns the ID of the last folder of the path if every component is cached, otherwise None."""
+    for name in names:
+        parent_id = _folder_id_cache.get((parent_id, name))
+        if parent_id is None:
+            return None
+    logging.debug(f"Found folder '{'/'.join(names)}' in cache with ID: {parent_id}")
+    return parent_id
+
+
+def _load_persisted_folder_path(names):
+    """Fills the in-memory cache with the persisted folder IDs of a path starting at the top level."""
+    paths = ['/'.join(names[:i + 1]) for i in range(len(names))]
+    persisted = database.select_drive_folders(paths)
+    parent_id = None
+    for name, path in zip(names, paths):
+        folder_id = persisted.get(path)
+        if folder_id is None:
+            return
+        _folder_id_cache[(parent_id, name)] = folder_id
+        parent_id = folder_id
+
+
+def get_day_folder_id(date):
+    """Returns the ID of the upload folder <UPLOAD_DIR>/<year>/<month>/<day> for a date, creating it if needed."""
+    folder_id = _day_folder_cache.get(date)
+    if folder_id is None:
+        folder_id = find_or_create_folder_path(day_folder_path(date))
+        if folder_id:
+            # forget_folder() iterates the cache under the lock, e.g. during the retention cleanup
+            with folder_creation_lock:
+                _day_folder_cache[date] = folder_id
+    return folder_id
+
+
+def day_folder_path(date):
+    return [UPLOAD_DIR, f"{date.year:04d}", f"{date.month:02d}", f"{date.day:02d}"]
+
+
+def forget_folder(folder_id):
+    """Drops a folder that no longer exists on Drive from the in-memory and the persisted cache."""
+    with folder_creation_lock:
+        for cache_key in [key for key, value in _folder_id_cache.items() if value == folder_id]:
+            del _folder_id_cache[cache_key]
+        for date in [date for date, value in _day_folder_cache.items() if value == folder_id]:
+            del _day_folder_cache[date]
+        database.delete_drive_folder(folder_id)
+
+
+def forget_folder_path(names):
+    """Drops all cached folders of a path starting at the top level, so it is looked up again on next use."""
+    parent_id = None
+    for name in names:
+        folder_id = _folder_id_cache.get((parent_id, name))
+        if folder_id is None:
+            return
+        forget_folder(folder_id)
+        parent_id = folder_id
+
+
+def _list_folders_by_name(names):
+    """Lists all folders matching any of the names with a single query, grouped by name."""
+    name_query = " or ".join(f"name='{_escape_query_value(name)}'" for name in sorted(names))
+    query = f"({name_query}) and mimeType='{FOLDER_MIME_TYPE}' and trashed=false"
+
+    folders = {}
+    page_token = None
+    while True:
+        results = get_thread_service().files().list(q=query, spaces='drive',
+                                                    fields='nextPageToken, files(id, name, parents)',
+                                                    pageSize=1000, pageToken=page_token).execute()
+        for folder in results.get('files', []):
+            folders.setdefault(folder['name'], []).append(folder)
+        page_token = results.get('nextPageToken')
+        if page_token is None:
+            return folders
+
+
 def get_folder_id(drive_service, folder_name, parent_id):
     try:
-        query = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
+        query = f"name='{_escape_query_value(folder_name)}' and mimeType='{FOLDER_MIME_TYPE}' and trashed=false"
         if parent_id:
             query += f" and '{parent_id}' in parents"
 
-        results = drive_service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
+        results = drive_service.files().list(q=query, spaces='drive', fields='files(id)', pageSize=1).execute()
         folders = results.get('files', [])
 
         if not folders:
@@ -218,6 +364,7 @@ def cleanup_empty_parent_folders(drive_service, folder_id):
 
             logging.info(f"Deleting empty folder: {folder_name} (ID: {folder_id})")
             drive_service.files().delete(fileId=folder_id).execute()
+            forget_folder(folder_id)
 
             # Recursively check the parent folder
             if parent_folders:
@@ -237,36 +384,240 @@ def exponential_backoff(retries):
     jitter = random.uniform(0, 1)
     return min(INITIAL_RETRY_DELAY * (2 ** (retries - 1)) + jitter, MAX_RETRY_DELAY)
 
+
+class StreamingMediaUpload(MediaUpload):
+    """
+    Resumable media upload fed from a non-seekable stream, e.g. the raw body of a Frigate download.
+    The total size is unknown up front. Drive has to be told with the last chunk, so the stream is read one
+    byte past the upcoming chunk and the size is reported as soon as EOF is seen, which also covers streams
+    ending exactly on a chunk boundary. Besides that read-ahead only the unacknowledged bytes of the current
+    chunk are kept, which is enough to re-send a chunk the server did not acknowledge.
+    """
+
+    def __init__(self, fd, mimetype, chunksize=UPLOAD_CHUNK_SIZE):
+        super().__init__()
+        self._fd = fd
+        self._mimetype = mimetype
+        self._chunksize = chunksize
+        self._buffer = b''
+        self._buffer_start = 0
+        self._served_end = 0
+        self._size = None
+
+    def chunksize(self):
+        return self._chunksize
+
+    def mimetype(self):
+        return self._mimetype
+
+    def size(self):
+        # Asked by the client before it builds the headers of the next chunk
+        if self._size is None:
+            self._fill(self._served_end + self._chunksize + 1)
+        return self._size
+
+    def resumable(self):
+        return True
+
+    def getbytes(self, begin, length):
+        if begin < self._buffer_start:
+            raise ValueError(f"Cannot rewind stream to byte {begin}, already discarded up to {self._buffer_start}")
+
+        # Drop everything the server has already acknowledged and top up the buffer from the stream
+        self._buffer = self._buffer[begin - self._buffer_start:]
+        self._buffer_start = begin
+        self._fill(begin + length)
+
+        data = self._buffer[:length]
+        self._served_end = begin + len(data)
+        return data
+
+    def _fill(self, end):
+        """Reads from the stream until the buffer reaches the absolute offset end or the stream is exhausted."""
+        parts = [self._buffer]
+        missing = end - (self._buffer_start + len(self._buffer))
+        eof = False
+        while missing > 0 and self._size is None:
+            data = self._fd.read(missing)
+            if not data:
+                eof = True
+                break
+            parts.append(data)
+            missing -= len(data)
+
+        self._buffer = b''.join(parts)
+        if eof:
+            self._size = self._buffer_start + len(self._buffer)
+
+
+class QueueReader(io.RawIOBase):
+    """
+    Readable file over a download that runs in a background thread. The download drains the response into a
+    bounded queue of blocks, so the connection to Frigate is released as soon as the clip is downloaded, even
+    while the upload is still sending it to Drive. Closing the reader stops the download and closes the response.
+    """
+
+    def __init__(self, response, block_size=DOWNLOAD_COPY_SIZE, queue_size=DOWNLOAD_QUEUE_SIZE):
+        super().__init__()
+        self._response = response
+        self._block_size = block_size
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = b''
+        self._eof = False
+        self._error = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._download, name='download', daemon=True)
+        self._thread.start()
+
+    def _download(self):
+        try:
+            for block in self._response.iter_content(chunk_size=self._block_size):
+                if block and not self._put(block):
+                    return
+            self._put(None)
+        except Exception as e:
+            self._put(e)
+        finally:
+            self._response.close()
+
+    def _put(self, item):
+        """Waits for room in the queue, gives up once the reader was closed."""
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def readable(self):
+        return True
+
+    def _next_block(self):
+        """Waits until a downloaded block is pending, returns False at the end of the download."""
+        while not self._pending:
+            if self._error is not None:
+                raise self._error
+            if self._eof:
+                return False
+            item = self._queue.get()
+            if item is None:
+                self._eof = True
+            elif isinstance(item, Exception):
+                self._error = item
+            else:
+                self._pending = item
+        return True
+
+    def read(self, size=-1):
+        # Hand out the downloaded blocks themselves. The default implementation would allocate a buffer of
+        # the requested size (a whole upload chunk) for every call and copy each block through it.
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+        if size is None or size < 0:
+            return self.readall()
+        if not self._next_block():
+            return b''
+        if size >= len(self._pending):
+            block, self._pending = self._pending, b''
+        else:
+            block, self._pending = self._pending[:size], self._pending[size:]
+        return block
+
+    def readinto(self, b):
+        block = self.read(len(b))
+        b[:len(block)] = block
+        return len(block)
+
+    def close(self):
+        self._stopped.set()
+        super().close()
+
+
+def create_download_session():
+    """Create a pooled requests session with a retry strategy for downloading clips from Frigate."""
+    session = requests.Session()
+    # Clips are mp4 and already compressed, compressing them again for transfer only costs CPU on both ends
+    session.headers['Accept-Encoding'] = 'identity'
+    retry_strategy = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=["GET"]
+    )
+    adapter = HTTPAdapter(pool_connections=DOWNLOAD_POOL_SIZE, pool_maxsize=DOWNLOAD_POOL_SIZE,
+                          max_retries=retry_strategy)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Shared by all downloads, so connections to Frigate are kept alive between events instead of
+# paying the TCP (and TLS) handshake for every clip
+download_session = create_download_session()
+
+
+class ClipUnavailableError(Exception):
+    """Frigate could not create the clip for an event, retrying right away won't change that."""
+
+
+def check_video_response(response):
+    """
+    Raises if a clip download failed, closing the response. Only a bounded prefix of the error body is
+    read, a misbehaving Frigate could otherwise keep us reading until the download timeout.
+    """
+    if response.ok:
+        return
+
+    try:
+        body = response.raw.read(ERROR_BODY_LIMIT, decode_content=True)
+    finally:
+        response.close()
+
+    try:
+        message = json.loads(body).get('message', '')
+    except (ValueError, AttributeError):
+        message = ''
+
+    if response.status_code == 500 and message == CLIP_UNAVAILABLE_MESSAGE:
+        raise ClipUnavailableError(f"{CLIP_UNAVAILABLE_MESSAGE} for url: {response.url}")
+    raise requests.HTTPError(f"{response.status_code} Error for url: {response.url} {message}", response=response)
+
+
+def open_video_stream(video_url):
+    """
+    Open a streaming download of a clip. Nothing is read from the body yet, the caller consumes
+    the response and is responsible for closing it.
+    """
+    response = download_session.get(video_url, stream=True, timeout=(DOWNLOAD_CONNECT_TIMEOUT, DOWNLOAD_TIMEOUT))
+    check_video_response(response)
+    return response
+
+
 def download_video_with_retry(video_url, max_retries=3):
-    """Download video with retry logic and proper timeout handling."""
+    """
+    Download video into a tempfile with retry logic and proper timeout handling.
+    Returns the open tempfile positioned at the start, the caller is responsible for closing it.
+    """
     retry_count = 0
     last_error = None
     
     while retry_count <= max_retries:
+        fh = None
         try:
-            with requests.Session() as session:
-                # Configure retry strategy for the download
-                retry_strategy = Retry(
-                    total=3,
-                    backoff_factor=1,
-                    status_forcelist=[500, 502, 503, 504],
-                    allowed_methods=["GET"]
-                )
-                adapter = HTTPAdapter(max_retries=retry_strategy)
-                session.mount("https://", adapter)
-                session.mount("http://", adapter)
-                
-                with session.get(video_url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
-                    response.raise_for_status()
-                    
-                    with tempfile.TemporaryFile() as fh:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            if chunk:  # filter out keep-alive new chunks
-                                fh.write(chunk)
-                        fh.seek(0)
-                        return fh.read()
+            with download_session.get(video_url, stream=True,
+                                      timeout=(DOWNLOAD_CONNECT_TIMEOUT, DOWNLOAD_TIMEOUT)) as response:
+                check_video_response(response)
+
+                fh = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode='w+b')
+                response.raw.decode_content = True
+                shutil.copyfileobj(response.raw, fh, length=DOWNLOAD_COPY_SIZE)
+                fh.seek(0)
+                return fh
                         
         except (requests.RequestException, ssl.SSLError, socket.timeout) as e:
+            if fh is not None:
+                fh.close()
             last_error = e
             retry_count += 1
             if retry_count <= max_retries:
@@ -277,97 +628,123 @@ def download_video_with_retry(video_url, max_retries=3):
     logging.error(f"Failed to download video after {max_retries} attempts. Last error: {last_error}")
     return None
 
+
+def upload_media(media, filename, parent_id):
+    """Upload media as a new file into the given folder using chunked resumable upload. Returns the file ID."""
+    file_metadata = {
+        'name': filename,
+        'parents': [parent_id]
+    }
+
+    request = get_thread_service().files().create(
+        body=file_metadata,
+        media_body=media,
+        fields='id',
+        supportsAllDrives=True
+    )
+
+    # Retry a failed chunk on the same resumable session, so a stalled request re-sends only that chunk
+    # instead of failing the whole upload and starting over. The client retries error responses itself,
+    # transport errors are raised to us. Calling next_chunk() again then asks Drive which bytes it already
+    # has and resumes from there.
+    response = None
+    chunk_retries = 0
+    while response is None:
+        try:
+            status, response = request.next_chunk(num_retries=MAX_RETRIES)
+        except (socket.timeout, ssl.SSLError, ConnectionError, httplib2.HttpLib2Error) as e:
+            chunk_retries += 1
+            if chunk_retries > MAX_RETRIES:
+                raise
+            wait_time = exponential_backoff(chunk_retries)
+            logging.warning(f"Chunk upload of {filename} failed ({chunk_retries}/{MAX_RETRIES}). "
+                            f"Resuming in {wait_time:.2f}s. Error: {e}")
+            time.sleep(wait_time)
+            continue
+        chunk_retries = 0
+        if status:
+            logging.debug(f"Upload progress: {int(status.progress() * 100)}%")
+
+    if 'id' not in response:
+        raise Exception("No file ID returned from Google Drive")
+    return response['id']
+
+
 def upload_to_google_drive(event, frigate_url):
-    """Upload a video to Google Drive with retry logic and proper error handling."""
-    import io  # Moved here to prevent early initialization issues
-    
+    """
+    Upload a video to Google Drive with retry logic and proper error handling.
+    The filename and the clip URL are derived once and reused by all attempts and log messages.
+    Raises ClipUnavailableError if Frigate could not create the clip, returns False on any other failure.
+    """
     camera_name = event['camera']
-    start_time = event['start_time']
     event_id = event['id']
-    filename = generate_filename(camera_name, start_time, event_id)
-    year, month, day = filename.split("__")[0].split("-")[:3]
+    local_time = to_local_time(event['start_time'])
+    filename = generate_filename(camera_name, local_time, event_id)
     video_url = generate_video_url(frigate_url, event_id)
 
     for attempt in range(MAX_RETRIES + 1):
         try:
-            # 1. Ensure folder structure exists
-            frigate_folder_id = find_or_create_folder(UPLOAD_DIR)
-            if not frigate_folder_id:
-                raise Exception(f"Failed to find or create folder: {UPLOAD_DIR}")
-
-            year_folder_id = find_or_create_folder(year, frigate_folder_id)
-            if not year_folder_id:
-                raise Exception(f"Failed to find or create folder: {year}")
-
-            month_folder_id = find_or_create_folder(month, year_folder_id)
-            if not month_folder_id:
-                raise Exception(f"Failed to find or create folder: {month}")
-
-            day_folder_id = find_or_create_folder(day, month_folder_id)
-            if not day_folder_id:
-                raise Exception(f"Failed to find or create folder: {day}")
-
-            # 2. Download video with retry logic
-            video_data = download_video_with_retry(video_url)
-            if video_data is None:
-                raise Exception(f"Failed to download video from {video_url}")
-
-            # 3. Upload to Google Drive with resumable upload
-            media = MediaIoBaseUpload(
-                io.BytesIO(video_data),
-                mimetype='video/mp4',
-                resumable=True,
-                chunksize=UPLOAD_CHUNK_SIZE
-            )
-            
-            file_metadata = {
-                'name': filename,
-                'parents': [day_folder_id]
-            }
-
-            request = service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id',
-                supportsAllDrives=True
-            )
-            
-            response = None
-            while response is None:
-                status, response = request.next_chunk()
-                if status:
-                    logging.debug(f"Upload progress: {int(status.progress() * 100)}%")
-            
-            if 'id' in response:
-                logging.info(f"Video {filename} successfully uploaded to Google Drive with ID: {response['id']}.")
-                return True
+            # 1. Start the download first, so an unavailable clip fails before any work is done on Drive.
+            # Either stream straight from Frigate or buffer the complete clip in a tempfile.
+            if STREAM_UPLOADS:
+                source = QueueReader(open_video_stream(video_url))
             else:
-                raise Exception("No file ID returned from Google Drive")
+                source = download_video_with_retry(video_url)
+                if source is None:
+                    raise Exception(f"Failed to download video from {video_url}")
+
+            with source:
+                # 2. Ensure folder structure exists
+                day_folder_id = get_day_folder_id(local_time.date())
+                if not day_folder_id:
+                    raise Exception(f"Failed to find or create folder: {'/'.join(day_folder_path(local_time))}")
+
+                # 3. Upload to Google Drive with resumable upload
+                if STREAM_UPLOADS:
+                    media = StreamingMediaUpload(source, mimetype='video/mp4')
+                else:
+                    media = MediaIoBaseUpload(source, mimetype='video/mp4', resumable=True,
+                                              chunksize=UPLOAD_CHUNK_SIZE)
+                file_id = upload_media(media, filename, day_folder_id)
+
+            logging.info(f"Video {filename} successfully uploaded to Google Drive with ID: {file_id}.")
+            return True
+
+        except ClipUnavailableError:
+            # Reported to the caller, which decides whether the event is worth retrying later
+            raise
 
         except HttpError as error:
+            if attempt < MAX_RETRIES and error.resp.status == 404:
+                # A cached folder was deleted on Drive in the meantime, resolve the path again
+                logging.warning(f"Attempt {attempt + 1}/{MAX_RETRIES} failed with status 404. "
+                                f"Looking up the upload folder again. Error: {error}")
+                forget_folder_path(day_folder_path(local_time))
+                continue
             if attempt < MAX_RETRIES and error.resp.status in [500, 502, 503, 504, 429]:
                 wait_time = exponential_backoff(attempt + 1)
                 logging.warning(f"Attempt {attempt + 1}/{MAX_RETRIES} failed with status {error.resp.status}. "
                               f"Retrying in {wait_time:.2f}s. Error: {error}")
                 time.sleep(wait_time)
                 continue
-            logging.error(f"HTTP error uploading to Google Drive: {error}")
+            logging.error(f"HTTP error uploading {filename} to Google Drive: {error}")
             return False
             
-        except (requests.RequestException, ssl.SSLError, socket.timeout, socket.error) as e:
+        # Errors while streaming the body surface from urllib3 directly, not wrapped by requests
+        except (requests.RequestException, Urllib3HTTPError, ssl.SSLError, socket.timeout, socket.error) as e:
             if attempt < MAX_RETRIES:
                 wait_time = exponential_backoff(attempt + 1)
                 logging.warning(f"Attempt {attempt + 1}/{MAX_RETRIES} failed. Retrying in {wait_time:.2f}s. Error: {e}")
                 time.sleep(wait_time)
                 continue
-            logging.error(f"Error in upload process: {e}", exc_info=True)
+            logging.error(f"Error in upload process of {filename} from {video_url}: {e}", exc_info=True)
             return False
             
         except Exception as e:
-            logging.error(f"Unexpected error: {e}", exc_info=True)
+            logging.error(f"Unexpected error uploading {filename} from {video_url}: {e}", exc_info=True)
             return False
     
-    logging.error(f"Failed to upload after {MAX_RETRIES + 1} attempts")
+    logging.error(f"Failed to upload {filename} from {video_url} after {MAX_RETRIES + 1} attempts")
     return False
 
 
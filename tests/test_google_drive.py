@@ -0,0 +1,111 @@
+import io
+import os
+import re
+import tempfile
+import unittest
+from unittest import mock
+
+import httplib2
+from googleapiclient.discovery import build_from_document
+
+# google_drive builds a Drive service on import, so it needs a service account file and credentials
+os.environ['SERVICE_ACCOUNT_FILE'] = tempfile.NamedTemporaryFile(suffix='.json', delete=False).name
+with mock.patch('google.oauth2.service_account.Credentials.from_service_account_file'):
+    from src import google_drive
+
+CHUNK_SIZE = 256 * 1024
+
+
+class FakeDriveHttp:
+    """Fake transport for the Drive resumable upload protocol, recording every chunk PUT."""
+
+    def __init__(self):
+        self.received = b''
+        self.content_ranges = []
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        if method == 'POST':
+            return httplib2.Response({'status': '200', 'location': 'https://upload.example/session'}), b''
+
+        content_range = headers['Content-Range']
+        self.content_ranges.append(content_range)
+        match = re.fullmatch(r'bytes (\d+)-(\d+)/(\*|\d+)', content_range)
+        if not match or int(match.group(1)) > int(match.group(2)):
+            return httplib2.Response({'status': '400'}), b'{"error": "invalid Content-Range"}'
+
+        self.received += body
+        if match.group(3) != '*':
+            return httplib2.Response({'status': '200'}), b'{"id": "uploaded-file"}'
+        return httplib2.Response({'status': '308', 'range': f'bytes=0-{len(self.received) - 1}'}), b''
+
+
+class StreamingMediaUploadTest(unittest.TestCase):
+
+    def upload(self, data):
+        http = FakeDriveHttp()
+        drive_service = build_from_document(google_drive.DRIVE_DISCOVERY_DOC, http=http)
+        media = google_drive.StreamingMediaUpload(io.BytesIO(data), mimetype='video/mp4', chunksize=CHUNK_SIZE)
+        with mock.patch.object(google_drive, 'get_thread_service', return_value=drive_service):
+            file_id = google_drive.upload_media(media, 'clip.mp4', 'folder-id')
+        return file_id, http
+
+    def test_stream_ending_on_chunk_boundary(self):
+        data = os.urandom(2 * CHUNK_SIZE)
+        file_id, http = self.upload(data)
+
+        self.assertEqual(file_id, 'uploaded-file')
+        self.assertEqual(http.received, data)
+        self.assertEqual(http.content_ranges, [f'bytes 0-{CHUNK_SIZE - 1}/*',
+                                               f'bytes {CHUNK_SIZE}-{2 * CHUNK_SIZE - 1}/{2 * CHUNK_SIZE}'])
+
+    def test_stream_of_exactly_one_chunk(self):
+        data = os.urandom(CHUNK_SIZE)
+        file_id, http = self.upload(data)
+
+        self.assertEqual(http.received, data)
+        self.assertEqual(http.content_ranges, [f'bytes 0-{CHUNK_SIZE - 1}/{CHUNK_SIZE}'])
+
+    def test_stream_ending_within_chunk(self):
+        data = os.urandom(CHUNK_SIZE + 1000)
+        file_id, http = self.upload(data)
+
+        self.assertEqual(http.received, data)
+        self.assertEqual(http.content_ranges[-1], f'bytes {CHUNK_SIZE}-{len(data) - 1}/{len(data)}')
+
+
+class FindOrCreateFolderPathTest(unittest.TestCase):
+
+    def setUp(self):
+        self.drive_service = mock.MagicMock()
+        self.drive_service.files().list().execute.return_value = {'files': []}
+        self.drive_service.files().create().execute.return_value = {'id': 'new-day'}
+        self.drive_service.files.reset_mock()
+        patches = [
+            mock.patch.object(google_drive, 'get_thread_service', return_value=self.drive_service),
+            mock.patch.object(google_drive, 'database', **{'select_drive_folders.return_value': {}}),
+            mock.patch.dict(google_drive._folder_id_cache, {
+                (None, 'frigate'): 'frigate-id',
+                ('frigate-id', '2026'): 'year-id',
+                ('year-id', '10'): 'month-id',
+            }, clear=True),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_only_queries_folders_below_cached_prefix(self):
+        folder_id = google_drive.find_or_create_folder_path(['frigate', '2026', '10', '15'])
+
+        self.assertEqual(folder_id, 'new-day')
+        query = self.drive_service.files().list.call_args.kwargs['q']
+        self.assertIn("name='15'", query)
+        self.assertNotIn("name='frigate'", query)
+        self.assertNotIn("name='2026'", query)
+        self.assertNotIn("name='10'", query)
+        self.drive_service.files().create.assert_called_once_with(
+            body={'name': '15', 'mimeType': google_drive.FOLDER_MIME_TYPE, 'parents': ['month-id']}, fields='id')
+        self.assertEqual(google_drive._folder_id_cache[('month-id', '15')], 'new-day')
+
+
+if __name__ == '__main__':
+    unittest.main()